@@ -1,11 +1,30 @@
 import os
+import functools
 import glob
+import hashlib
+import itertools
 import math
-from typing import Dict, List, Tuple, Optional
-
+import queue
+import threading
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple, Optional
+
+import numpy as np
 import pandas as pd
 import pymysql
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ModuleNotFoundError:
+    # pyarrow is optional; fall back to pandas' chunked reader
+    pa = None
+
 try:
     from dotenv import load_dotenv
     load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
@@ -51,11 +70,33 @@ MYSQL_SSL_ENABLED = _get_env_bool("MYSQL_SSL_ENABLED", "DB_SSL_ENABLED", default
 MYSQL_SSL_VERIFY_CERT = _get_env_bool("MYSQL_SSL_VERIFY_CERT", default=False)
 MYSQL_SSL_VERIFY_IDENTITY = _get_env_bool("MYSQL_SSL_VERIFY_IDENTITY", default=False)
 MYSQL_SSL_CA = _get_env("MYSQL_SSL_CA")
+# Requires local_infile=ON on the server; off by default on MySQL 8.
+MYSQL_LOAD_DATA_LOCAL = _get_env_bool("MYSQL_LOAD_DATA_LOCAL", default=False)
+# First-time population: defer the non-unique measurements indexes and FK checks until the end.
+BULK_LOAD = _get_env_bool("BULK_LOAD", default=False)
+# Ingest-mode session settings (see INGEST_SESSION_SQL); turn off for steady-state writers.
+MYSQL_INGEST_SESSION = _get_env_bool("MYSQL_INGEST_SESSION", default=True)
 
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 DEFAULT_CSV_GLOB = os.path.join(PROJECT_ROOT, "data", "*.csv")
 CSV_GLOB = os.getenv("CSV_GLOB", DEFAULT_CSV_GLOB)
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "5000"))
+INSERT_BATCH_SIZE = int(os.getenv("INSERT_BATCH_SIZE", "1000"))
+CSV_BLOCK_SIZE = int(os.getenv("CSV_BLOCK_SIZE", str(8 << 20)))
+# 0 = one worker process per CPU (capped at the number of files)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0"))
+# >1 splits each measurements upsert by sensor_id across that many extra
+# connections (per worker process) committed in parallel
+UPSERT_SHARDS = int(os.getenv("UPSERT_SHARDS", "1"))
+# Replays of a shard whose transaction InnoDB rolled back on a deadlock (1213)
+# or lock wait timeout (1205)
+SHARD_LOCK_RETRIES = 3
+LOCK_ERROR_CODES = {1205, 1213}
+# Parsed chunks allowed to wait for the DB writer thread
+WRITE_QUEUE_SIZE = 4
+
+# Exports look like: 2026/01/21 00:00:14
+TIME_FORMAT = "%Y/%m/%d %H:%M:%S"
 
 
 # ----------------------------
@@ -85,16 +126,32 @@ DDL = [
         value_text VARCHAR(255) NULL,
         status VARCHAR(50) NULL,
 
+        UNIQUE KEY uq_measurement (device_id, sensor_id, timestamp),{indexes}
         FOREIGN KEY (device_id) REFERENCES devices(device_id),
-        FOREIGN KEY (sensor_id) REFERENCES sensors(sensor_id),
-
-        UNIQUE KEY uq_measurement (device_id, sensor_id, timestamp),
-        INDEX idx_device_time (device_id, timestamp),
-        INDEX idx_sensor_time (sensor_id, timestamp)
+        FOREIGN KEY (sensor_id) REFERENCES sensors(sensor_id)
     ) ENGINE=InnoDB;
     """
 ]
 
+# Secondary (non-unique) indexes on measurements; left off the DDL during a
+# BULK_LOAD and built in one ALTER TABLE pass afterwards. uq_measurement is never
+# deferred: the upserts need it to find existing rows.
+MEASUREMENT_INDEXES = {
+    "idx_device_time": "INDEX idx_device_time (device_id, timestamp)",
+    "idx_sensor_time": "INDEX idx_sensor_time (sensor_id, timestamp)",
+}
+
+# Run on every (re)connect when MYSQL_INGEST_SESSION is on. The loader always writes
+# devices/sensors before their measurements, so FK checks are redundant, and READ
+# COMMITTED avoids gap locks between parallel workers upserting the same table.
+# unique_checks stays on (upserts depend on it) and innodb_flush_log_at_trx_commit
+# is GLOBAL-only, so it is left to the server config (see README).
+INGEST_SESSION_SQL = "SET SESSION foreign_key_checks = 0, transaction_isolation = 'READ-COMMITTED'"
+
+# Staging table for LOAD DATA re-runs; same keys as measurements so REPLACE
+# dedups within a batch before the upsert.
+STAGE_DDL = "CREATE TEMPORARY TABLE IF NOT EXISTS measurements_stage LIKE measurements"
+
 
 # ----------------------------
 # DB helpers
@@ -119,7 +176,10 @@ def get_mysql_connection(database: Optional[str] = None):
             "password": MYSQL_PASSWORD,
             "database": database or MYSQL_DATABASE,
             "autocommit": False,
+            "local_infile": MYSQL_LOAD_DATA_LOCAL,
         }
+        if MYSQL_INGEST_SESSION:
+            connect_kwargs["init_command"] = INGEST_SESSION_SQL
         if MYSQL_SSL_ENABLED:
             ssl_kwargs = {
                 "verify_mode": MYSQL_SSL_VERIFY_CERT,
@@ -136,11 +196,59 @@ def get_mysql_connection(database: Optional[str] = None):
         raise RuntimeError(f"MySQL connection failed: {e}") from e
 
 
-def run_query(query: str, params=None, fetch: bool = False):
-    connection = None
+_CONNECTION = None
+
+
+@contextmanager
+def db_session():
+    """Yield the module's cached connection, reconnecting it if it has dropped."""
+    global _CONNECTION
+    if _CONNECTION is None:
+        _CONNECTION = get_mysql_connection()
+    else:
+        try:
+            _CONNECTION.ping(reconnect=True)
+        except Exception as e:
+            raise RuntimeError(f"MySQL connection failed: {e}") from e
+    yield _CONNECTION
+
+
+_SHARD_CONNECTIONS: List = []
+_SHARD_POOL: Optional[ThreadPoolExecutor] = None
+
+
+def _shard_sessions(n: int):
+    """Return n extra cached connections and the thread pool that drives them."""
+    global _SHARD_POOL
+    while len(_SHARD_CONNECTIONS) < n:
+        _SHARD_CONNECTIONS.append(get_mysql_connection())
+    for conn in _SHARD_CONNECTIONS:
+        try:
+            conn.ping(reconnect=True)
+        except Exception as e:
+            raise RuntimeError(f"MySQL connection failed: {e}") from e
+    if _SHARD_POOL is None:
+        _SHARD_POOL = ThreadPoolExecutor(max_workers=n)
+    return _SHARD_CONNECTIONS[:n], _SHARD_POOL
+
+
+def close_db_session():
+    global _CONNECTION, _SHARD_POOL
+    if _SHARD_POOL is not None:
+        _SHARD_POOL.shutdown()
+        _SHARD_POOL = None
+    while _SHARD_CONNECTIONS:
+        _SHARD_CONNECTIONS.pop().close()
+    if _CONNECTION is not None:
+        try:
+            _CONNECTION.close()
+        finally:
+            _CONNECTION = None
+
+
+def run_query(connection, query: str, params=None, fetch: bool = False):
     cursor = None
     try:
-        connection = get_mysql_connection()
         cursor = connection.cursor()
         cursor.execute(query, params or ())
         if fetch:
@@ -148,124 +256,313 @@ def run_query(query: str, params=None, fetch: bool = False):
         connection.commit()
         return None
     except Exception as e:
-        if connection:
-            connection.rollback()
+        connection.rollback()
         raise RuntimeError(f"MySQL query failed: {e}") from e
     finally:
         if cursor:
             cursor.close()
-        if connection:
-            connection.close()
 
 
-def ensure_schema():
-    connection = None
+def ensure_schema(connection, bulk_load: bool = False) -> List[str]:
+    """Create the tables; returns the measurements indexes left for after the load.
+
+    Indexes are only deferred for a bulk load. A measurements table missing any
+    of them (e.g. an earlier bulk load that did not finish) gets them rebuilt
+    here, or deferred again under ``bulk_load``. A table without uq_measurement
+    is refused, since every upsert into it would silently add duplicates.
+    """
     cursor = None
     try:
-        connection = get_mysql_connection()
         cursor = connection.cursor()
+        cursor.execute("SHOW TABLES LIKE 'measurements'")
+        exists = cursor.fetchone() is not None
+
+        if exists:
+            cursor.execute("SHOW INDEX FROM measurements")
+            present = {row[2] for row in cursor.fetchall()}
+            if "uq_measurement" not in present:
+                raise RuntimeError(
+                    "measurements has no uq_measurement unique key; remove duplicate "
+                    "(device_id, sensor_id, timestamp) rows and add it before loading"
+                )
+            missing = [name for name in MEASUREMENT_INDEXES if name not in present]
+        else:
+            missing = list(MEASUREMENT_INDEXES)
+        deferred = missing if bulk_load else []
+
+        indexes = "".join(
+            f"\n        {idx}," for name, idx in MEASUREMENT_INDEXES.items() if name not in deferred
+        )
         for stmt in DDL:
-            cursor.execute(stmt)
+            cursor.execute(stmt.replace("{indexes}", indexes))
         connection.commit()
     except Exception as e:
-        if connection:
-            connection.rollback()
+        connection.rollback()
         raise RuntimeError(f"Schema creation failed: {e}") from e
     finally:
         if cursor:
             cursor.close()
-        if connection:
-            connection.close()
 
+    if exists and missing and not bulk_load:
+        print(f"Rebuilding missing measurements indexes: {', '.join(missing)}")
+        add_measurement_indexes(connection, missing)
+    return deferred
+
+
+def set_bulk_load_session(connection):
+    # unique_checks stays on: uq_measurement is live during the load and the
+    # upserts rely on it.
+    with connection.cursor() as cursor:
+        cursor.execute("SET SESSION foreign_key_checks = 0")
+
+
+def add_measurement_indexes(connection, names: List[str]):
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "ALTER TABLE measurements " + ", ".join(f"ADD {MEASUREMENT_INDEXES[name]}" for name in names)
+        )
+        connection.commit()
+    except Exception as e:
+        connection.rollback()
+        raise RuntimeError(f"Building measurements indexes failed: {e}") from e
+    finally:
+        if cursor:
+            cursor.close()
+
+
+def _multivalue_insert(cursor, sql_head: str, sql_tail: str, cols: int, rows: Iterable, page: int = INSERT_BATCH_SIZE):
+    """Execute ``sql_head VALUES-list sql_tail`` once per ``page`` rows.
 
-def insert_devices(device_pairs: List[Tuple[str, str]]):
+    The multi-row VALUES list is built here rather than left to executemany,
+    whose rewrite does not reliably apply to upserts and otherwise falls back
+    to one round-trip per row. ``rows`` may be a lazy iterator; only one page
+    is materialized at a time and the final partial page is sent once it runs out.
+    """
+    it = iter(rows)
+    while True:
+        batch = list(itertools.islice(it, page))
+        if not batch:
+            break
+        sql = _multivalue_sql(sql_head, sql_tail, cols, len(batch))
+        cursor.execute(sql, [value for row in batch for value in row])
+
+
+@functools.lru_cache(maxsize=64)
+def _multivalue_sql(sql_head: str, sql_tail: str, cols: int, nrows: int) -> str:
+    # Every full page shares one statement text, so it is built once per process
+    placeholder = "(" + ", ".join(["%s"] * cols) + ")"
+    return sql_head + ",".join([placeholder] * nrows) + sql_tail
+
+
+def insert_devices(connection, device_pairs: List[Tuple[str, str]]):
     if not device_pairs:
         return
-    connection = None
     cursor = None
     try:
-        connection = get_mysql_connection()
         cursor = connection.cursor()
-        cursor.executemany(
-            """
-            INSERT INTO devices (device_id, device_name)
-            VALUES (%s, %s)
-            ON DUPLICATE KEY UPDATE device_name = VALUES(device_name)
-            """,
+        _multivalue_insert(
+            cursor,
+            "INSERT INTO devices (device_id, device_name) VALUES ",
+            " ON DUPLICATE KEY UPDATE device_name = VALUES(device_name)",
+            2,
             device_pairs
         )
         connection.commit()
     except Exception as e:
-        if connection:
-            connection.rollback()
+        connection.rollback()
         raise RuntimeError(f"Insert devices failed: {e}") from e
     finally:
         if cursor:
             cursor.close()
-        if connection:
-            connection.close()
 
 
-def insert_sensors(sensor_names: List[str]):
+def insert_sensors(connection, sensor_names: List[str]):
     if not sensor_names:
         return
-    connection = None
     cursor = None
     try:
-        connection = get_mysql_connection()
         cursor = connection.cursor()
-        cursor.executemany(
-            "INSERT IGNORE INTO sensors (sensor_name) VALUES (%s)",
+        _multivalue_insert(
+            cursor,
+            "INSERT IGNORE INTO sensors (sensor_name) VALUES ",
+            "",
+            1,
             [(s,) for s in sensor_names]
         )
         connection.commit()
     except Exception as e:
-        if connection:
-            connection.rollback()
+        connection.rollback()
         raise RuntimeError(f"Insert sensors failed: {e}") from e
     finally:
         if cursor:
             cursor.close()
-        if connection:
-            connection.close()
 
 
-def load_sensor_id_map() -> Dict[str, int]:
-    rows = run_query("SELECT sensor_id, sensor_name FROM sensors", fetch=True) or []
-    return {name: int(sid) for (sid, name) in rows}
+_SENSOR_ID_MAP: Optional[Dict[str, int]] = None
 
 
-def bulk_upsert_measurements(rows: List[Tuple[str, int, str, Optional[float], Optional[str], Optional[str]]]):
+def load_sensor_id_map(connection, refresh: bool = False) -> Dict[str, int]:
+    """Return sensor_name -> sensor_id, cached per process until ``refresh``."""
+    global _SENSOR_ID_MAP
+    if _SENSOR_ID_MAP is not None and not refresh:
+        return _SENSOR_ID_MAP
+    sensor_id_map: Dict[str, int] = {}
+    try:
+        # Unbuffered cursor: rows stream in instead of being loaded up front
+        with connection.cursor(pymysql.cursors.SSDictCursor) as cursor:
+            cursor.execute("SELECT sensor_id, sensor_name FROM sensors")
+            for row in cursor:
+                sensor_id_map[row["sensor_name"]] = int(row["sensor_id"])
+    except Exception as e:
+        raise RuntimeError(f"MySQL query failed: {e}") from e
+    _SENSOR_ID_MAP = sensor_id_map
+    return sensor_id_map
+
+
+MEASUREMENT_COLUMNS = "(device_id, sensor_id, timestamp, value_double, value_text, status)"
+MEASUREMENT_UPSERT_TAIL = """
+    ON DUPLICATE KEY UPDATE
+        value_double = VALUES(value_double),
+        value_text   = VALUES(value_text),
+        status       = VALUES(status)
+"""
+
+
+def bulk_upsert_measurements(connection, rows: Iterable[Tuple[str, int, datetime, Optional[float], Optional[str], Optional[str]]]):
     if not rows:
         return
-    connection = None
+    if UPSERT_SHARDS > 1:
+        # Shards never write the same (device, sensor, timestamp) key, but the
+        # upsert's duplicate check still takes next-key locks on uq_measurement,
+        # where one device's sensors sit side by side; shards can deadlock on a
+        # re-run, so each one is replayed on a lock error (see _upsert_shard).
+        # Replaying needs the rows kept, so with shards the whole chunk is
+        # materialized here instead of streamed one page at a time.
+        shards = [[] for _ in range(UPSERT_SHARDS)]
+        for row in rows:
+            shards[row[1] % UPSERT_SHARDS].append(row)
+        connections, pool = _shard_sessions(UPSERT_SHARDS)
+        futures = [
+            pool.submit(_upsert_shard, conn, shard)
+            for conn, shard in zip(connections, shards) if shard
+        ]
+        for future in futures:
+            future.result()
+        return
+    _upsert_measurement_rows(connection, rows)
+
+
+def _upsert_shard(connection, rows: List[Tuple]):
+    """Upsert one materialized shard, replaying it after a lock conflict rollback."""
+    for attempt in range(SHARD_LOCK_RETRIES + 1):
+        try:
+            _upsert_measurement_rows(connection, rows)
+            return
+        except RuntimeError as e:
+            cause = e.__cause__
+            retryable = isinstance(cause, pymysql.err.OperationalError) and cause.args[0] in LOCK_ERROR_CODES
+            if not retryable or attempt == SHARD_LOCK_RETRIES:
+                raise
+            time.sleep(0.1 * (attempt + 1))
+
+
+def _upsert_measurement_rows(connection, rows):
     cursor = None
     try:
-        connection = get_mysql_connection()
         cursor = connection.cursor()
-        cursor.executemany(
-            """
-            INSERT INTO measurements
-                (device_id, sensor_id, timestamp, value_double, value_text, status)
-            VALUES
-                (%s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-                value_double = VALUES(value_double),
-                value_text   = VALUES(value_text),
-                status       = VALUES(status)
-            """,
+        _multivalue_insert(
+            cursor,
+            f"INSERT INTO measurements {MEASUREMENT_COLUMNS} VALUES ",
+            MEASUREMENT_UPSERT_TAIL,
+            6,
             rows
         )
         connection.commit()
     except Exception as e:
-        if connection:
-            connection.rollback()
+        connection.rollback()
         raise RuntimeError(f"Upsert measurements failed: {e}") from e
     finally:
         if cursor:
             cursor.close()
-        if connection:
-            connection.close()
+
+
+def measurements_table_empty(connection) -> bool:
+    rows = run_query(connection, "SELECT 1 FROM measurements LIMIT 1", fetch=True)
+    return not rows
+
+
+def _tsv_field(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, float):
+        return "\\N" if math.isnan(value) else repr(float(value))
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _load_data_local(cursor, table: str, rows) -> None:
+    # PyMySQL streams LOCAL INFILE from a path on disk, so spool the batch to a temp TSV.
+    f = tempfile.NamedTemporaryFile("w", suffix=".tsv", encoding="utf-8", newline="", delete=False)
+    path = f.name
+    try:
+        with f:
+            for row in rows:
+                f.write("\t".join(_tsv_field(v) for v in row))
+                f.write("\n")
+        cursor.execute(
+            f"""
+            LOAD DATA LOCAL INFILE %s
+            REPLACE INTO TABLE {table}
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+            LINES TERMINATED BY '\\n'
+            {MEASUREMENT_COLUMNS}
+            """,
+            (path,)
+        )
+    finally:
+        os.remove(path)
+
+
+def load_measurements_infile(connection, rows, direct: bool = False):
+    """Bulk load rows with LOAD DATA LOCAL INFILE.
+
+    With ``direct`` the rows go straight into ``measurements`` (first ingest);
+    otherwise they are staged in a temp table and upserted so existing ids are kept.
+    """
+    if not rows:
+        return
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        if direct:
+            _load_data_local(cursor, "measurements", rows)
+        else:
+            cursor.execute(STAGE_DDL)
+            cursor.execute("DELETE FROM measurements_stage")
+            _load_data_local(cursor, "measurements_stage", rows)
+            cursor.execute(
+                f"""
+                INSERT INTO measurements {MEASUREMENT_COLUMNS}
+                SELECT device_id, sensor_id, timestamp, value_double, value_text, status
+                FROM measurements_stage
+                {MEASUREMENT_UPSERT_TAIL}
+                """
+            )
+        connection.commit()
+    except Exception as e:
+        connection.rollback()
+        raise RuntimeError(f"Load measurements failed: {e}") from e
+    finally:
+        if cursor:
+            cursor.close()
 
 
 # ----------------------------
@@ -281,26 +578,19 @@ def find_sensor_bases(columns: List[str]) -> List[str]:
     return sorted(bases)
 
 
-def try_float(x) -> Tuple[Optional[float], Optional[str]]:
-    if x is None:
-        return (None, None)
-    if isinstance(x, float) and math.isnan(x):
-        return (None, None)
-    if isinstance(x, (int, float)):
-        return (float(x), None)
+_CSV_SCHEMA_CACHE: Dict[str, Tuple[List[str], List[str]]] = {}
 
-    s = str(x).strip()
-    if s == "" or s.lower() == "nan":
-        return (None, None)
-
-    try:
-        return (float(s), None)
-    except ValueError:
-        return (None, s[:255])
 
+def read_csv_schema(csv_path: str) -> Tuple[List[str], List[str]]:
+    """Return (sensor_bases, usecols) for a CSV, memoized by its header line.
 
-def process_csv(csv_path: str):
-    print(f"\n=== Processing: {os.path.basename(csv_path)} ===")
+    Most exports share one header, so only the first file per schema pays for
+    parsing it.
+    """
+    with open(csv_path, "rb") as f:
+        key = hashlib.sha1(f.readline()).hexdigest()
+    if key in _CSV_SCHEMA_CACHE:
+        return _CSV_SCHEMA_CACHE[key]
 
     # Read header
     header_df = pd.read_csv(csv_path, nrows=0)
@@ -313,17 +603,8 @@ def process_csv(csv_path: str):
 
     sensor_bases = find_sensor_bases(cols)
 
-    # Insert devices (unique devices seen in file preview)
-    preview = pd.read_csv(csv_path, usecols=["device_id", "device_name"], nrows=500)
-    device_pairs = list({(str(r["device_id"]), str(r["device_name"])) for _, r in preview.iterrows()})
-    insert_devices(device_pairs)
-
-    # Insert sensors and refresh map
-    insert_sensors(sensor_bases)
-    sensor_id_map = load_sensor_id_map()
-
     # Determine columns to read in chunks
-    usecols = ["device_id", "time"]
+    usecols = ["device_id", "device_name", "time"]
     for b in sensor_bases:
         vcol = f"{b}_value"
         scol = f"{b}_status"
@@ -332,46 +613,238 @@ def process_csv(csv_path: str):
         if scol in cols:
             usecols.append(scol)
 
-    # Chunked read
-    for chunk in pd.read_csv(csv_path, usecols=usecols, chunksize=CHUNK_SIZE):
-        # Parse timestamps (matches your exports: 2026/01/21 00:00:14)
-        chunk["timestamp"] = pd.to_datetime(chunk["time"], format="%Y/%m/%d %H:%M:%S", errors="coerce")
-        chunk = chunk.dropna(subset=["timestamp"])
-        if chunk.empty:
-            continue
+    _CSV_SCHEMA_CACHE[key] = (sensor_bases, usecols)
+    return sensor_bases, usecols
 
-        device_ids = chunk["device_id"].astype(str).tolist()
-        timestamps = chunk["timestamp"].dt.strftime("%Y-%m-%d %H:%M:%S").tolist()
 
-        out_rows: List[Tuple[str, int, str, Optional[float], Optional[str], Optional[str]]] = []
+def clip_text(values: pd.Series, width: int) -> pd.Series:
+    """Vectorized ``str(x)[:width]`` that leaves missing cells missing."""
+    if not pd.api.types.is_string_dtype(values):
+        values = values.astype(str).where(values.notna())
+    return values.str.slice(0, width)
 
-        for base in sensor_bases:
-            sid = sensor_id_map.get(base)
-            if sid is None:
-                continue
 
-            vcol = f"{base}_value"
-            scol = f"{base}_status"
+def split_numeric_text(values: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Split a raw value column into (value_double, value_text) columns.
 
-            values = chunk[vcol].tolist() if vcol in chunk.columns else [None] * len(chunk)
-            statuses = chunk[scol].tolist() if scol in chunk.columns else [None] * len(chunk)
+    Numeric cells land in value_double; anything non-empty that does not parse
+    as a number is kept (stripped, max 255 chars) in value_text.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype("float64"), pd.Series(None, index=values.index, dtype=object)
 
-            for dev, ts, v, st in zip(device_ids, timestamps, values, statuses):
-                vd, vt = try_float(v)
+    numeric = pd.to_numeric(values, errors="coerce").astype("float64")
+    text = pd.Series(None, index=values.index, dtype=object)
 
-                # normalize status
-                status_str = None
-                if st is not None and not (isinstance(st, float) and math.isnan(st)):
-                    status_str = str(st)[:50]
+    # Only cells that did not coerce as-is need the string path (padding, 'nan', text)
+    rest = values.notna() & numeric.isna()
+    if rest.any():
+        raw = values[rest].astype(str).str.strip()
+        raw = raw.mask((raw == "") | (raw.str.lower() == "nan"))
+        parsed = pd.to_numeric(raw, errors="coerce").astype("float64")
+        numeric[rest] = parsed
+        text[rest] = clip_text(raw.where(parsed.isna()), 255)
+    return numeric, text
 
-                # Skip totally empty readings
-                if vd is None and vt is None and status_str is None:
-                    continue
 
-                out_rows.append((dev, sid, ts, vd, vt, status_str))
+def iter_csv_chunks(csv_path: str, usecols: List[str]):
+    """Yield CHUNK_SIZE-row frames of ``usecols`` plus a parsed ``timestamp`` column.
 
-        bulk_upsert_measurements(out_rows)
-        print(f"  inserted/updated: {len(out_rows):,} measurements")
+    Unparseable times come back as NaT. Uses pyarrow's multithreaded reader when
+    available; every column is read as string because sparse sensor columns are
+    often empty for the whole first block, which would pin their inferred type to null.
+    """
+    if pa is None:
+        for chunk in pd.read_csv(csv_path, usecols=usecols, chunksize=CHUNK_SIZE):
+            chunk["timestamp"] = pd.to_datetime(chunk["time"], format=TIME_FORMAT, errors="coerce")
+            yield chunk
+        return
+
+    reader = pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE, use_threads=True),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=usecols,
+            column_types={c: pa.string() for c in usecols},
+            strings_can_be_null=True,
+        ),
+    )
+    for batch in reader:
+        batch = batch.append_column(
+            "timestamp",
+            pc.strptime(batch.column("time"), format=TIME_FORMAT, unit="s", error_is_null=True),
+        )
+        for offset in range(0, batch.num_rows, CHUNK_SIZE):
+            yield batch.slice(offset, CHUNK_SIZE).to_pandas()
+
+
+def _measurement_writer(connection, batches: queue.Queue, errors: List[BaseException], direct_load: bool, name: str):
+    """Drain (device_pairs, rows, n_rows) batches until the None sentinel.
+
+    Runs on its own thread and is the only user of ``connection`` while a file
+    is streaming, so devices still land before the measurements that need them.
+    After a failure it keeps draining so the producer never blocks on a full queue.
+    """
+    while True:
+        item = batches.get()
+        if item is None:
+            return
+        if errors:
+            continue
+        device_pairs, rows, n_rows = item
+        try:
+            insert_devices(connection, device_pairs)
+            if n_rows:
+                if MYSQL_LOAD_DATA_LOCAL:
+                    load_measurements_infile(connection, rows, direct=direct_load)
+                else:
+                    bulk_upsert_measurements(connection, rows)
+            print(f"  {name}: inserted/updated: {n_rows:,} measurements")
+        except BaseException as e:
+            errors.append(e)
+
+
+def process_csv(connection, csv_path: str, direct_load: bool = False):
+    name = os.path.basename(csv_path)
+    print(f"\n=== Processing: {name} ===")
+
+    sensor_bases, usecols = read_csv_schema(csv_path)
+
+    # Insert sensors and refresh map only if this file has sensors the cache
+    # has not seen (another worker may have inserted them, so always re-read)
+    known = _SENSOR_ID_MAP or {}
+    new_sensors = [b for b in sensor_bases if b not in known]
+    if new_sensors:
+        insert_sensors(connection, new_sensors)
+    sensor_id_map = load_sensor_id_map(connection, refresh=bool(new_sensors))
+    loaded_bases = [b for b in sensor_bases if b in sensor_id_map]
+
+    # Devices are upserted as they show up in the stream (before their measurements)
+    seen_devices: Dict[str, Optional[str]] = {}
+
+    # Parse on this thread while the writer thread waits on the DB
+    batches: queue.Queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+    errors: List[BaseException] = []
+    writer = threading.Thread(
+        target=_measurement_writer, args=(connection, batches, errors, direct_load, name), daemon=True
+    )
+    writer.start()
+    try:
+        _stream_chunks(csv_path, usecols, loaded_bases, sensor_id_map, seen_devices, batches, errors)
+    finally:
+        batches.put(None)
+        writer.join()
+    if errors:
+        raise errors[0]
+
+
+def _stream_chunks(
+    csv_path: str,
+    usecols: List[str],
+    loaded_bases: List[str],
+    sensor_id_map: Dict[str, int],
+    seen_devices: Dict[str, Optional[str]],
+    batches: queue.Queue,
+    errors: List[BaseException],
+):
+    """Parse ``csv_path`` chunk by chunk and queue (new device pairs, measurement rows, row count)."""
+    # Chunked read
+    for chunk in iter_csv_chunks(csv_path, usecols):
+        if errors:
+            return
+        chunk = chunk.dropna(subset=["timestamp"])
+        if chunk.empty:
+            continue
+
+        device_ids = chunk["device_id"].astype(str)
+        # object dtype so a missing name stays None (str dtype would turn it back into NaN)
+        device_names = chunk["device_name"].astype(str).astype(object).where(chunk["device_name"].notna(), None)
+        devices = pd.DataFrame({"device_id": device_ids, "device_name": device_names})
+        devices = devices.drop_duplicates("device_id", keep="last")
+        delta = {
+            k: v for k, v in zip(devices["device_id"], devices["device_name"])
+            if k not in seen_devices or seen_devices[k] != v
+        }
+        seen_devices.update(delta)
+
+        if not loaded_bases:
+            # No sensor columns: the devices are still upserted
+            batches.put((list(delta.items()), iter(()), 0))
+            continue
+
+        # Wide -> long: one row per (device_id, timestamp, sensor base)
+        wide = chunk.reindex(columns=[f"{b}_{field}" for b in loaded_bases for field in ("value", "status")])
+        wide.columns = pd.MultiIndex.from_product([loaded_bases, ["value", "status"]], names=["base", None])
+        wide.index = pd.MultiIndex.from_arrays(
+            [device_ids, chunk["timestamp"]],
+            names=["device_id", "timestamp"],
+        )
+        long = wide.stack(level="base").dropna(how="all").reset_index()
+
+        vd, vt = split_numeric_text(long["value"])
+        st = clip_text(long["status"], 50)
+
+        # Null masks computed once on the raw arrays (np.isnan on the float buffer)
+        vd_values = vd.to_numpy(dtype="float64")
+        vd_null = np.isnan(vd_values)
+        vt_null = vt.isna().to_numpy()
+        st_null = st.isna().to_numpy()
+
+        # Skip totally empty readings
+        keep = ~(vd_null & vt_null & st_null)
+
+        # Build the 6 output columns as object arrays and zip them into rows;
+        # NULLs must reach the driver as None, not NaN.
+        columns = [
+            long["device_id"].to_numpy()[keep],
+            long["base"].map(sensor_id_map).to_numpy()[keep],
+            # datetime64[us] -> object yields datetime.datetime, which PyMySQL
+            # formats itself (no strftime round-trip)
+            long["timestamp"].to_numpy()[keep].astype("datetime64[us]").astype(object),
+        ]
+        for values, nulls in ((vd_values, vd_null), (vt.to_numpy(dtype=object), vt_null), (st.to_numpy(dtype=object), st_null)):
+            values = values[keep].astype(object)
+            values[nulls[keep]] = None
+            columns.append(values)
+        # Lazy: tuples are only built as the writer pages through them
+        # (UPSERT_SHARDS > 1 materializes the chunk; see bulk_upsert_measurements)
+        out_rows = zip(*(c.tolist() for c in columns))
+
+        batches.put((list(delta.items()), out_rows, int(keep.sum())))
+
+
+def group_csv_files(csv_files: List[str]) -> List[List[str]]:
+    """Group CSV paths that share any device_id, keeping input order.
+
+    Files for one device can repeat (device, sensor, timestamp) keys, so each
+    group is loaded in order by a single worker: overlapping rows never race
+    and the last file still wins, as in a sequential load.
+    """
+    groups: List[Tuple[List[int], set]] = []
+    for pos, path in enumerate(csv_files):
+        try:
+            devices = set(pd.read_csv(path, usecols=["device_id"], dtype=str)["device_id"].dropna())
+        except ValueError:
+            # No device_id column (or empty file); process_csv reports it
+            devices = set()
+        # A file can bridge several earlier groups, so merge every one it overlaps
+        positions, merged = [pos], set(devices)
+        for group in [g for g in groups if g[1] & devices]:
+            groups.remove(group)
+            positions += group[0]
+            merged |= group[1]
+        groups.append((sorted(positions), merged))
+    groups.sort(key=lambda g: g[0][0])
+    return [[csv_files[i] for i in positions] for positions, _ in groups]
+
+
+def _process_csv_worker(csv_paths: List[str], direct_load: bool = False, bulk_load: bool = False):
+    # Each worker process lazily opens and then reuses its own connection.
+    with db_session() as connection:
+        if bulk_load:
+            set_bulk_load_session(connection)
+        for csv_path in csv_paths:
+            process_csv(connection, csv_path, direct_load=direct_load)
 
 
 def main():
@@ -382,10 +855,37 @@ def main():
     print(f"Using DB: {MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}")
     print(f"Found {len(csv_files)} CSV files via: {CSV_GLOB}")
 
-    ensure_schema()
+    file_groups = group_csv_files(csv_files)
+    workers = min(INGEST_WORKERS or os.cpu_count() or 1, len(file_groups))
 
-    for f in csv_files:
-        process_csv(f)
+    try:
+        with db_session() as connection:
+            deferred_indexes = ensure_schema(connection, bulk_load=BULK_LOAD)
+            # An empty table can take LOAD DATA directly; otherwise stage and upsert.
+            direct_load = MYSQL_LOAD_DATA_LOCAL and measurements_table_empty(connection)
+
+            if workers <= 1:
+                if deferred_indexes:
+                    set_bulk_load_session(connection)
+                for f in csv_files:
+                    process_csv(connection, f, direct_load=direct_load)
+    finally:
+        # Also keeps forked workers from inheriting this connection's socket
+        close_db_session()
+
+    if workers > 1:
+        print(f"Ingesting with {workers} worker processes")
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            n = len(file_groups)
+            list(ex.map(_process_csv_worker, file_groups, [direct_load] * n, [bool(deferred_indexes)] * n))
+
+    if deferred_indexes:
+        print("Building measurements indexes...")
+        try:
+            with db_session() as connection:
+                add_measurement_indexes(connection, deferred_indexes)
+        finally:
+            close_db_session()
 
     print("\n✅ Done! Tables populated: devices, sensors, measurements")
 
@@ -8,6 +8,7 @@ import glob
 import os
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Dict, List, Tuple
 
@@ -179,6 +180,22 @@ def build_failure_hint(config: Dict[str, str], exc: Exception) -> str:
     return f"hint=unknown_connection_issue host={host} port={port} check network path and database logs"
 
 
+def check_env_file(env_file: Path, user: str, timeout_seconds: int) -> Tuple[bool, str]:
+    config: Dict[str, str] = {}
+    try:
+        config = parse_env_file(env_file)
+        required = ["MYSQL_HOST", "MYSQL_USER", "MYSQL_PASSWORD", "MYSQL_DATABASE"]
+        missing = [k for k in required if not config.get(k)]
+        if missing:
+            raise RuntimeError(f"missing keys: {', '.join(missing)}")
+
+        current_user, current_db = test_connection(config, timeout_seconds)
+        return True, f"[PASS] {user:<8} file={env_file} db={current_db} current_user={current_user}"
+    except Exception as exc:
+        hint = build_failure_hint(config, exc)
+        return False, f"[FAIL] {user:<8} file={env_file} error={exc} {hint}"
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Test DB connections for all env/.env.<user> files.")
     parser.add_argument("--env-dir", default="env", help="Directory containing .env.<user> files.")
@@ -203,33 +220,29 @@ def main() -> int:
 
     selected_users = {u.lower() for u in args.users}
 
-    failures = 0
-    tested = 0
-
+    targets: List[Tuple[Path, str]] = []
     for env_file in env_files:
         user_from_filename = env_file.name.replace(".env.", "", 1)
         if selected_users and user_from_filename.lower() not in selected_users:
             continue
+        targets.append((env_file, user_from_filename))
 
-        tested += 1
-        try:
-            config = parse_env_file(env_file)
-            required = ["MYSQL_HOST", "MYSQL_USER", "MYSQL_PASSWORD", "MYSQL_DATABASE"]
-            missing = [k for k in required if not config.get(k)]
-            if missing:
-                raise RuntimeError(f"missing keys: {', '.join(missing)}")
-
-            current_user, current_db = test_connection(config, args.timeout)
-            print(f"[PASS] {user_from_filename:<8} file={env_file} db={current_db} current_user={current_user}")
-        except Exception as exc:
-            failures += 1
-            hint = build_failure_hint(config if "config" in locals() else {}, exc)
-            print(f"[FAIL] {user_from_filename:<8} file={env_file} error={exc} {hint}")
-
+    tested = len(targets)
     if tested == 0:
         print("[ERROR] no matching users/files to test", file=sys.stderr)
         return 2
 
+    # Connect to every target at once so TCP/TLS handshakes overlap; results
+    # print in completion order.
+    failures = 0
+    with ThreadPoolExecutor(max_workers=min(16, tested)) as executor:
+        futures = [executor.submit(check_env_file, env_file, user, args.timeout) for env_file, user in targets]
+        for future in as_completed(futures):
+            ok, line = future.result()
+            if not ok:
+                failures += 1
+            print(line)
+
     print(f"\nSummary: {tested - failures}/{tested} succeeded, {failures} failed.")
     return 1 if failures else 0
 